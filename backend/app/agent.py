@@ -1,33 +1,98 @@
 """Google ADK Agent configuration for the form filler."""
 
-import os
-from typing import Any
+import time
+import asyncio
+import functools
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Optional
 
 from google.adk import Agent, Runner
 from google.adk.sessions import InMemorySessionService
 from google.genai import types
 
-from app.session import Session
-from app.tools.inspect import inspect_form_structure
+from app.session import Session, session_manager
+from app.tools.inspect import ainspect_form_structure
 from app.tools.validate import validate_country
 from app.tools.update import update_order_document, add_movie
 
 
+APP_NAME = "form_filler"
+
 # Session service for ADK
 session_service = InMemorySessionService()
 
+
+class _RunnerPool:
+    """Bounded LRU of runners and app sessions per user session, with TTL expiry."""
+
+    def __init__(self, max_size: int = 256, ttl: float = 3600.0):
+        self._entries: OrderedDict[str, tuple[Runner, Session, float]] = OrderedDict()
+        self._max_size = max_size
+        self._ttl = ttl
+
+    def add(self, session: Session, runner: Runner) -> None:
+        """
+        Store the runner for a session, evicting the oldest sessions if full.
+        
+        Evicted sessions are deleted from the session manager as well, so their
+        clients get a clean 404 instead of a session without a runner.
+        """
+        self._entries[session.id] = (runner, session, time.monotonic() + self._ttl)
+        self._entries.move_to_end(session.id)
+        while len(self._entries) > self._max_size:
+            oldest = next(iter(self._entries))
+            # The delete callback evicts the entry; evict directly in case the
+            # session had already left the session manager
+            session_manager.delete_session(oldest)
+            self.evict(oldest)
+
+    def get_runner(self, session_id: str) -> Runner | None:
+        """Get the runner for a session and mark it as recently used."""
+        entry = self._entries.get(session_id)
+        if entry is None:
+            return None
+        self._entries.move_to_end(session_id)
+        return entry[0]
+
+    def get_session(self, session_id: str) -> Session | None:
+        """Get the app session by ID."""
+        entry = self._entries.get(session_id)
+        return entry[1] if entry else None
+
+    def evict(self, session_id: str) -> None:
+        """Drop a session's runner and its ADK session state."""
+        if self._entries.pop(session_id, None) is None:
+            return
+        session_service.delete_session(
+            app_name=APP_NAME,
+            user_id=session_id,
+            session_id=session_id
+        )
+
+    def sweep(self) -> int:
+        """Remove all expired entries. Returns count of removed entries."""
+        now = time.monotonic()
+        expired = [sid for sid, (_, _, expires_at) in self._entries.items() if now > expires_at]
+        for sid in expired:
+            self.evict(sid)
+        return len(expired)
+
+
 # Store runners and sessions per user session
-_runners: dict[str, Runner] = {}
-_app_sessions: dict[str, Session] = {}
+runner_pool = _RunnerPool(ttl=session_manager.ttl)
+
+# Free the runner whenever the app session is deleted or expires
+session_manager.add_delete_callback(runner_pool.evict)
 
 
 def _get_current_session(session_id: str) -> Session | None:
     """Get the current app session by ID."""
-    return _app_sessions.get(session_id)
+    return runner_pool.get_session(session_id)
 
 
 # Tool functions that will be exposed to the agent
-def inspect_form(session_id: str) -> dict:
+async def inspect_form(session_id: str) -> dict:
     """
     Inspect the uploaded document to identify form fields and structure.
     Call this first to understand what fields need to be filled.
@@ -41,7 +106,7 @@ def inspect_form(session_id: str) -> dict:
     session = _get_current_session(session_id)
     if not session:
         return {"error": "Session not found"}
-    return inspect_form_structure(session)
+    return await ainspect_form_structure(session)
 
 
 def validate_shipping_country(country_name: str) -> dict:
@@ -127,6 +192,57 @@ def check_form_completion(session_id: str) -> dict:
     return update_order_document(session)
 
 
+def update_order_bulk(
+    session_id: str,
+    name: str | None = None,
+    street: str | None = None,
+    postal_code_city: str | None = None,
+    country: str | None = None,
+    movie_titles: list[str] | None = None,
+    movie_languages: list[str] | None = None
+) -> dict:
+    """
+    Update several customer fields and add several movies in one call.
+    
+    Args:
+        session_id: The session ID (automatically provided)
+        name: Customer's full name
+        street: Street address
+        postal_code_city: Postal/ZIP code and city combined
+        country: Country (must be validated first using validate_shipping_country)
+        movie_titles: Titles of movies to add
+        movie_languages: Language of each movie, in the same order as movie_titles
+    
+    Returns:
+        Dictionary with the added movies, current form state and missing fields
+    """
+    session = _get_current_session(session_id)
+    if not session:
+        return {"error": "Session not found"}
+    
+    movie_titles = movie_titles or []
+    movie_languages = movie_languages or []
+    if len(movie_titles) != len(movie_languages):
+        return {
+            "error": f"Got {len(movie_titles)} movie title(s) but {len(movie_languages)} language(s); "
+                     "provide one language per title"
+        }
+    
+    movies_added = []
+    for title, language in zip(movie_titles, movie_languages):
+        movies_added.append(add_movie(session, title=title, language=language)["movie_added"])
+    
+    result = update_order_document(
+        session,
+        name=name,
+        street=street,
+        postal_code_city=postal_code_city,
+        country=country
+    )
+    result["movies_added"] = movies_added
+    return result
+
+
 SYSTEM_INSTRUCTION = """You are a friendly and helpful assistant that helps users fill out movie order forms.
 
 Your job is to:
@@ -147,88 +263,166 @@ IMPORTANT RULES:
 - When all information is complete, let the user know they can download their filled form
 
 Start by greeting the user and inspecting the form, then ask for their information step by step.
-If the user provides multiple pieces of information at once, process them all.
+If the user provides multiple pieces of information at once, call update_all exactly once with all of them
+instead of the individual update tools (still validate the country first).
 
 CRITICAL: When calling tools that need session_id, always use the session_id that was provided in the system context.
 """
 
 
-def create_agent_for_session(session_id: str) -> Agent:
-    """Create an agent configured for a specific session."""
-    
-    # Create wrapper functions that inject the session_id
-    def inspect_form_wrapper() -> dict:
-        """Inspect the uploaded document to identify form fields and structure."""
-        return inspect_form(session_id)
-    
-    def validate_country_wrapper(country_name: str) -> dict:
-        """Validate if a country name is valid for shipping."""
-        return validate_shipping_country(country_name)
-    
-    def update_name(name: str) -> dict:
-        """Update customer's full name."""
-        return update_customer_info(session_id, name=name)
-    
-    def update_street(street: str) -> dict:
-        """Update customer's street address."""
-        return update_customer_info(session_id, street=street)
-    
-    def update_postal_code_city(postal_code_city: str) -> dict:
-        """Update customer's postal code and city."""
-        return update_customer_info(session_id, postal_code_city=postal_code_city)
-    
-    def update_country(country: str) -> dict:
-        """Update customer's country. Must be validated first using validate_country_wrapper."""
-        return update_customer_info(session_id, country=country)
-    
-    def add_movie_wrapper(title: str, language: str) -> dict:
-        """Add a movie to the order."""
-        return add_movie_to_order(session_id, title, language)
-    
-    def check_completion_wrapper() -> dict:
-        """Check if all required fields are complete."""
-        return check_form_completion(session_id)
-    
+@dataclass
+class SessionContext:
+    """Session an agent's tools act on; rebound when a pre-warmed agent is handed out."""
+    session_id: str = ""
+
+
+# Tool implementations; each agent binds its SessionContext via functools.partial
+async def _inspect_form_tool(context: SessionContext) -> dict:
+    return await inspect_form(context.session_id)
+
+
+def _update_name_tool(context: SessionContext, name: str) -> dict:
+    return update_customer_info(context.session_id, name=name)
+
+
+def _update_street_tool(context: SessionContext, street: str) -> dict:
+    return update_customer_info(context.session_id, street=street)
+
+
+def _update_postal_code_city_tool(context: SessionContext, postal_code_city: str) -> dict:
+    return update_customer_info(context.session_id, postal_code_city=postal_code_city)
+
+
+def _update_country_tool(context: SessionContext, country: str) -> dict:
+    return update_customer_info(context.session_id, country=country)
+
+
+def _add_movie_tool(context: SessionContext, title: str, language: str) -> dict:
+    return add_movie_to_order(context.session_id, title, language)
+
+
+def _check_completion_tool(context: SessionContext) -> dict:
+    return check_form_completion(context.session_id)
+
+
+# Optional[...] rather than "| None": ADK can't build a tool schema from union syntax
+def _update_all_tool(
+    context: SessionContext,
+    name: Optional[str] = None,
+    street: Optional[str] = None,
+    postal_code_city: Optional[str] = None,
+    country: Optional[str] = None,
+    movie_titles: Optional[list[str]] = None,
+    movie_languages: Optional[list[str]] = None
+) -> dict:
+    return update_order_bulk(
+        context.session_id,
+        name=name,
+        street=street,
+        postal_code_city=postal_code_city,
+        country=country,
+        movie_titles=movie_titles,
+        movie_languages=movie_languages
+    )
+
+
+def validate_country_wrapper(country_name: str) -> dict:
+    """Validate if a country name is valid for shipping."""
+    return validate_shipping_country(country_name)
+
+
+# Session-bound tools: (tool name, description shown to the model, implementation)
+_SESSION_TOOL_SPECS = (
+    ("inspect_form_wrapper", "Inspect the uploaded document to identify form fields and structure.",
+     _inspect_form_tool),
+    ("update_name", "Update customer's full name.", _update_name_tool),
+    ("update_street", "Update customer's street address.", _update_street_tool),
+    ("update_postal_code_city", "Update customer's postal code and city.", _update_postal_code_city_tool),
+    ("update_country", "Update customer's country. Must be validated first using validate_country_wrapper.",
+     _update_country_tool),
+    ("add_movie_wrapper", "Add a movie to the order.", _add_movie_tool),
+    ("check_completion_wrapper", "Check if all required fields are complete.", _check_completion_tool),
+    ("update_all", "Update several customer fields and add several movies at once. "
+     "movie_languages pairs with movie_titles by position.", _update_all_tool),
+)
+
+
+def _bind_session_tools(context: SessionContext) -> list:
+    """Bind the session tool implementations to a context, named for ADK's schema."""
+    tools = []
+    for name, description, func in _SESSION_TOOL_SPECS:
+        tool = functools.partial(func, context)
+        tool.__name__ = name
+        tool.__doc__ = description
+        tools.append(tool)
+    return tools
+
+
+def create_agent_for_session(context: SessionContext) -> Agent:
+    """Create an agent whose tools act on the session in the given context."""
     return Agent(
         model="gemini-2.0-flash",
         name="form_filler_agent",
         instruction=SYSTEM_INSTRUCTION,
-        tools=[
-            inspect_form_wrapper,
-            validate_country_wrapper,
-            update_name,
-            update_street,
-            update_postal_code_city,
-            update_country,
-            add_movie_wrapper,
-            check_completion_wrapper
-        ]
+        tools=[validate_country_wrapper, *_bind_session_tools(context)]
     )
 
 
+# Number of idle agents/runners kept ready for new sessions
+WARM_POOL_SIZE = 2
+
+# Pre-built runners waiting to be bound to a session
+_warm_pool: asyncio.Queue[tuple[Runner, SessionContext]] = asyncio.Queue(maxsize=WARM_POOL_SIZE)
+
+# Keep references to refill tasks so they aren't garbage collected mid-run
+_refill_tasks: set[asyncio.Task] = set()
+
+
+def _build_runner() -> tuple[Runner, SessionContext]:
+    """Build an agent and runner that is not yet bound to a session."""
+    context = SessionContext()
+    agent = create_agent_for_session(context)
+    runner = Runner(
+        agent=agent,
+        app_name=APP_NAME,
+        session_service=session_service
+    )
+    return runner, context
+
+
+async def _refill_warm_pool() -> None:
+    """Top up the pool of pre-built runners."""
+    while not _warm_pool.full():
+        _warm_pool.put_nowait(_build_runner())
+
+
+async def prewarm_agents() -> None:
+    """Build idle runners at startup so the first uploads skip agent construction."""
+    await _refill_warm_pool()
+
+
 async def initialize_session(session: Session) -> None:
     """Initialize the ADK agent for a new session."""
-    # Store app session
-    _app_sessions[session.id] = session
-    
     # Create ADK session (sync method)
     adk_session = session_service.create_session(
-        app_name="form_filler",
+        app_name=APP_NAME,
         user_id=session.id,
         session_id=session.id
     )
     
-    # Create agent with session-specific tools
-    agent = create_agent_for_session(session.id)
+    # Take a pre-warmed runner if one is ready, otherwise build one now
+    if not _warm_pool.empty():
+        runner, context = _warm_pool.get_nowait()
+        task = asyncio.create_task(_refill_warm_pool())
+        _refill_tasks.add(task)
+        task.add_done_callback(_refill_tasks.discard)
+    else:
+        runner, context = _build_runner()
     
-    # Create runner
-    runner = Runner(
-        agent=agent,
-        app_name="form_filler",
-        session_service=session_service
-    )
+    # Bind the agent's tools to this session
+    context.session_id = session.id
     
-    _runners[session.id] = runner
+    runner_pool.add(session, runner)
     
     # Send initial message to start the conversation
     await process_message(session, "[System: User has uploaded a document. Start the conversation.]")
@@ -236,9 +430,9 @@ async def initialize_session(session: Session) -> None:
 
 async def process_message(session: Session, user_message: str) -> None:
     """Process a user message through the agent and stream responses."""
-    runner = _runners.get(session.id)
+    runner = runner_pool.get_runner(session.id)
     if not runner:
-        await session.message_queue.put({
+        session.push_message({
             "type": "error",
             "content": "Session not properly initialized"
         })
@@ -269,20 +463,20 @@ async def process_message(session: Session, user_message: str) -> None:
                                 "content": part.text
                             })
                             # Send to stream
-                            await session.message_queue.put({
+                            session.push_message({
                                 "type": "message",
                                 "role": "assistant",
                                 "content": part.text
                             })
         
         # Signal completion of this response
-        await session.message_queue.put({
+        session.push_message({
             "type": "done",
             "is_complete": session.is_complete
         })
         
     except Exception as e:
-        await session.message_queue.put({
+        session.push_message({
             "type": "error",
             "content": str(e)
         })
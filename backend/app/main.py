@@ -1,6 +1,6 @@
 """FastAPI application for the Agentic Form Filler."""
 
-import os
+import asyncio
 from pathlib import Path
 from contextlib import asynccontextmanager
 
@@ -8,17 +8,36 @@ from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from dotenv import load_dotenv
 
+from app.agent import prewarm_agents, runner_pool
+from app.session import session_manager
+
 # Load environment variables
 load_dotenv()
 
 
+# Seconds between sweeps for expired sessions
+CLEANUP_INTERVAL = 60
+
+
+async def _cleanup_sessions_periodically() -> None:
+    """Remove expired sessions and their agent runners in the background."""
+    while True:
+        await asyncio.sleep(CLEANUP_INTERVAL)
+        session_manager.cleanup_expired()
+        runner_pool.sweep()
+
+
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     """Application lifespan handler."""
     # Startup: ensure upload directory exists
     Path("uploads").mkdir(exist_ok=True)
+    # Startup: build idle agents so the first uploads don't pay for it
+    await prewarm_agents()
+    cleanup_task = asyncio.create_task(_cleanup_sessions_periodically())
     yield
-    # Shutdown: cleanup could go here
+    # Shutdown: stop the cleanup loop
+    cleanup_task.cancel()
 
 
 app = FastAPI(
@@ -1,14 +1,20 @@
 """API routes for the form filler application."""
 
 import asyncio
-import json
+import os
+import secrets
+import shutil
 from pathlib import Path
+from typing import Any, BinaryIO
 
 from fastapi import APIRouter, UploadFile, File, HTTPException
 from fastapi.responses import FileResponse, StreamingResponse
 from pydantic import BaseModel
+import orjson
 
+from app.agent import initialize_session, process_message
 from app.session import session_manager
+from app.tools.update import generate_filled_document
 
 
 router = APIRouter()
@@ -31,6 +37,30 @@ class StatusResponse(BaseModel):
     form_data: dict
 
 
+def _save_upload(src: BinaryIO, stem: str) -> Path:
+    """
+    Stream an uploaded file into the upload directory in 64 KiB chunks.
+    
+    A random suffix keeps names unique without probing the directory, and the
+    file is written under a temporary name so it only appears once complete.
+    """
+    file_path = session_manager.upload_dir / f"{stem}_{secrets.token_hex(4)}.docx"
+    tmp_path = file_path.with_suffix(".docx.part")
+    try:
+        with open(tmp_path, "wb") as dst:
+            shutil.copyfileobj(src, dst, 1 << 16)
+        os.replace(tmp_path, file_path)
+    except BaseException:
+        tmp_path.unlink(missing_ok=True)
+        raise
+    return file_path
+
+
+def _sse_frame(payload: Any) -> bytes:
+    """Encode a payload as an SSE data frame."""
+    return b"data: " + orjson.dumps(payload) + b"\n\n"
+
+
 @router.post("/upload", response_model=UploadResponse)
 async def upload_document(file: UploadFile = File(...)):
     """Upload a .docx file and create a new session."""
@@ -41,24 +71,14 @@ async def upload_document(file: UploadFile = File(...)):
             detail="Only .docx files are accepted"
         )
 
-    # Save the file
-    file_path = session_manager.upload_dir / f"{file.filename}"
-    
-    # Handle duplicate filenames
-    counter = 1
-    original_stem = file_path.stem
-    while file_path.exists():
-        file_path = session_manager.upload_dir / f"{original_stem}_{counter}.docx"
-        counter += 1
-
-    content = await file.read()
-    file_path.write_bytes(content)
+    # Save the file without buffering it all in memory
+    filename = Path(file.filename).name
+    file_path = await asyncio.to_thread(_save_upload, file.file, Path(filename).stem)
 
     # Create session
-    session = session_manager.create_session(file_path)
+    session = session_manager.create_session(file_path, filename)
 
     # Initialize the agent for this session
-    from app.agent import initialize_session
     await initialize_session(session)
 
     return UploadResponse(
@@ -81,7 +101,6 @@ async def send_message(session_id: str, chat_message: ChatMessage):
     })
 
     # Process with agent
-    from app.agent import process_message
     await process_message(session, chat_message.message)
 
     return {"status": "processing"}
@@ -95,26 +114,35 @@ async def stream_messages(session_id: str):
         raise HTTPException(status_code=404, detail="Session not found or expired")
 
     async def event_generator():
-        """Generate SSE events from the message queue."""
+        """Generate SSE events from the session's message buffer."""
         while True:
-            try:
-                # Wait for messages with timeout
-                message = await asyncio.wait_for(
-                    session.message_queue.get(),
-                    timeout=30.0
-                )
-                
-                if message.get("type") == "done":
-                    yield f"data: {json.dumps(message)}\n\n"
-                    break
-                elif message.get("type") == "close":
+            if not session.message_buffer:
+                session.message_ready.clear()
+                try:
+                    # Wait for messages with timeout
+                    await asyncio.wait_for(session.message_ready.wait(), timeout=30.0)
+                except asyncio.TimeoutError:
+                    # Send keepalive
+                    yield b": keepalive\n\n"
+                    continue
+            
+            # Coalesce everything available into one frame, up to a terminal event
+            batch = []
+            terminal = None
+            while session.message_buffer:
+                message = session.message_buffer.popleft()
+                if message.get("type") in ("done", "close"):
+                    terminal = message
                     break
-                else:
-                    yield f"data: {json.dumps(message)}\n\n"
-                    
-            except asyncio.TimeoutError:
-                # Send keepalive
-                yield ": keepalive\n\n"
+                batch.append(message)
+            
+            if batch:
+                yield _sse_frame(batch)
+            
+            if terminal is not None:
+                if terminal.get("type") == "done":
+                    yield _sse_frame(terminal)
+                break
 
     return StreamingResponse(
         event_generator(),
@@ -153,14 +181,25 @@ async def download_document(session_id: str):
             detail="Form is not complete. Please provide all required information."
         )
 
-    # Generate the filled document
-    from app.tools.update import generate_filled_document
-    output_path = generate_filled_document(session)
+    # Generate the filled document off the event loop, reusing the last one
+    # if the form data hasn't changed (e.g. a repeated download click)
+    async with session.output_lock:
+        data_hash = hash(orjson.dumps(session.form_data.to_dict(), option=orjson.OPT_SORT_KEYS))
+        cached = session.cached_output
+        if cached and cached[0] == data_hash and cached[1].exists():
+            output_path = cached[1]
+        else:
+            output_path = await asyncio.to_thread(generate_filled_document, session)
+            session.cached_output = (data_hash, output_path)
+
+    # Pass the stat result so Starlette sets Content-Length without its own stat call
+    stat_result = await asyncio.to_thread(os.stat, output_path)
 
     return FileResponse(
         path=output_path,
-        filename=f"filled_{session.file_path.name}",
-        media_type="application/vnd.openxmlformats-officedocument.wordprocessingml.document"
+        filename=f"filled_{session.filename}",
+        media_type="application/vnd.openxmlformats-officedocument.wordprocessingml.document",
+        stat_result=stat_result
     )
 
 
@@ -1,11 +1,14 @@
 """Session management for the form filler application."""
 
 import uuid
+import heapq
+import time
 import asyncio
+from collections import deque
 from dataclasses import dataclass, field
-from datetime import datetime, timedelta
+from datetime import datetime
 from pathlib import Path
-from typing import Any
+from typing import Any, Callable
 
 
 @dataclass
@@ -19,13 +22,17 @@ class FormData:
 
     def is_complete(self) -> bool:
         """Check if all required fields are filled."""
-        return all([
-            self.name,
-            self.street,
-            self.postal_code_city,
-            self.country,
-            len(self.movies) > 0
-        ])
+        return bool(
+            self.name
+            and self.street
+            and self.postal_code_city
+            and self.country
+            and self.movies
+        )
+
+    def filled_attrs(self) -> set[str]:
+        """Get the names of the fields that have a value."""
+        return {name for name, value in self.to_dict().items() if value}
 
     def to_dict(self) -> dict[str, Any]:
         """Convert to dictionary."""
@@ -57,17 +64,31 @@ class Session:
     """User session containing file and form state."""
     id: str
     file_path: Path
-    created_at: datetime
+    # Name the file was uploaded under; the stored copy has a random suffix
+    filename: str
+    # time.monotonic() deadline; compared on every lookup
+    expires_at: float
+    # Wall-clock creation time, kept for observability only
+    created_at: datetime = field(default_factory=datetime.now)
     form_structure: FormStructure | None = None
     form_data: FormData = field(default_factory=FormData)
     chat_history: list[dict[str, str]] = field(default_factory=list)
-    message_queue: asyncio.Queue = field(default_factory=asyncio.Queue)
+    message_buffer: deque[dict[str, Any]] = field(default_factory=deque)
+    message_ready: asyncio.Event = field(default_factory=asyncio.Event)
     is_complete: bool = False
+    # (form data hash, path) of the last generated filled document
+    cached_output: tuple[int, Path] | None = None
+    output_lock: asyncio.Lock = field(default_factory=asyncio.Lock)
 
     def __post_init__(self):
-        # Ensure message_queue is always an asyncio.Queue
-        if not isinstance(self.message_queue, asyncio.Queue):
-            self.message_queue = asyncio.Queue()
+        # Ensure message_ready is always an asyncio.Event
+        if not isinstance(self.message_ready, asyncio.Event):
+            self.message_ready = asyncio.Event()
+
+    def push_message(self, message: dict[str, Any]) -> None:
+        """Buffer a message for the SSE stream and wake up the reader."""
+        self.message_buffer.append(message)
+        self.message_ready.set()
 
 
 class SessionManager:
@@ -75,19 +96,28 @@ class SessionManager:
 
     def __init__(self, expiry_hours: int = 1):
         self._sessions: dict[str, Session] = {}
-        self._expiry_delta = timedelta(hours=expiry_hours)
+        self._ttl = expiry_hours * 3600.0
         self._upload_dir = Path("uploads")
         self._upload_dir.mkdir(exist_ok=True)
+        self._delete_callbacks: list[Callable[[str], None]] = []
+        # Min-heap of (expiry timestamp, session ID) so cleanup only touches expiring sessions
+        self._expiry_heap: list[tuple[float, str]] = []
 
-    def create_session(self, file_path: Path) -> Session:
+    def add_delete_callback(self, callback: Callable[[str], None]) -> None:
+        """Register a callback invoked with the session ID when a session is deleted."""
+        self._delete_callbacks.append(callback)
+
+    def create_session(self, file_path: Path, filename: str) -> Session:
         """Create a new session for an uploaded file."""
         session_id = str(uuid.uuid4())
         session = Session(
             id=session_id,
             file_path=file_path,
-            created_at=datetime.now()
+            filename=filename,
+            expires_at=time.monotonic() + self._ttl
         )
         self._sessions[session_id] = session
+        heapq.heappush(self._expiry_heap, (session.expires_at, session_id))
         return session
 
     def get_session(self, session_id: str) -> Session | None:
@@ -97,7 +127,7 @@ class SessionManager:
             return None
 
         # Check expiration
-        if datetime.now() - session.created_at > self._expiry_delta:
+        if time.monotonic() > session.expires_at:
             self.delete_session(session_id)
             return None
 
@@ -108,23 +138,32 @@ class SessionManager:
         session = self._sessions.pop(session_id, None)
         if session and session.file_path.exists():
             session.file_path.unlink()
+        if session:
+            for callback in self._delete_callbacks:
+                callback(session_id)
 
     def cleanup_expired(self) -> int:
         """Remove all expired sessions. Returns count of removed sessions."""
-        now = datetime.now()
-        expired = [
-            sid for sid, session in self._sessions.items()
-            if now - session.created_at > self._expiry_delta
-        ]
-        for sid in expired:
-            self.delete_session(sid)
-        return len(expired)
+        now = time.monotonic()
+        removed = 0
+        while self._expiry_heap and self._expiry_heap[0][0] <= now:
+            _, sid = heapq.heappop(self._expiry_heap)
+            # Entries for sessions already deleted are simply dropped
+            if sid in self._sessions:
+                self.delete_session(sid)
+                removed += 1
+        return removed
 
     @property
     def upload_dir(self) -> Path:
         """Get the upload directory path."""
         return self._upload_dir
 
+    @property
+    def ttl(self) -> float:
+        """Get how long sessions live before expiring, in seconds."""
+        return self._ttl
+
 
 # Global session manager instance
 session_manager = SessionManager()
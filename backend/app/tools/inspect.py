@@ -1,9 +1,14 @@
 """Tool for inspecting form structure in uploaded documents."""
 
+import asyncio
+import copy
+import functools
+import io
 import re
+import zipfile
+import xml.etree.ElementTree as ET
 from pathlib import Path
 from docx import Document
-from docx.oxml.ns import qn
 
 from app.session import Session, FormStructure
 
@@ -11,118 +16,203 @@ from app.session import Session, FormStructure
 # Checkbox unicode characters to detect
 CHECKBOX_CHARS = ['☐', '□', '○', '◯', '☑', '✓', '✔']
 
+# WordprocessingML element names used when reading document.xml directly
+_W = '{http://schemas.openxmlformats.org/wordprocessingml/2006/main}'
+_W_BODY = _W + 'body'
+_W_P = _W + 'p'
+_W_R = _W + 'r'
+_W_T = _W + 't'
+_W_TAB = _W + 'tab'
+_W_BR = _W + 'br'
+_W_CR = _W + 'cr'
+_W_HYPERLINK = _W + 'hyperlink'
+_W_TBL = _W + 'tbl'
+_W_TR = _W + 'tr'
+_W_TC = _W + 'tc'
+_W_TCPR = _W + 'tcPr'
+_W_GRIDSPAN = _W + 'gridSpan'
+_W_VAL = _W + 'val'
 
-def _extract_movie_options(doc: Document) -> list[str]:
+# Checkbox characters plus bracket-style boxes, checked with C-level set/translate ops
+_CHECKBOX_SET = frozenset(CHECKBOX_CHARS) | frozenset('[]()')
+_CHECKBOX_TRANSLATE = str.maketrans('', '', ''.join(_CHECKBOX_SET))
+
+# Compiled once at import; \s also covers non-breaking and other Unicode spaces
+_LEAD_SEP_RE = re.compile(r'^[\s\-–—:]+')
+
+# Patterns to match common field labels
+_FIELD_RES = {
+    "name": re.compile(r"(?i)\b(name|full\s*name|customer\s*name)\s*[:：]?\s*[_\s]*"),
+    "street": re.compile(r"(?i)\b(street|address|street\s*address)\s*[:：]?\s*[_\s]*"),
+    "postal_city": re.compile(r"(?i)\b(postal\s*code|zip|city|postal\s*code\s*and\s*city|zip\s*code)\s*[:：]?\s*[_\s]*"),
+    "country": re.compile(r"(?i)\b(country|nation)\s*[:：]?\s*[_\s]*")
+}
+
+# FormStructure flag set for each detected field
+_FIELD_FLAGS = {field_name: f"has_{field_name}_field" for field_name in _FIELD_RES}
+
+
+def _paragraph_text(p: ET.Element) -> str:
     """
-    Extract available movie options from checkbox lists in the document.
+    Concatenate the run text of a <w:p> element like python-docx does.
+    
+    Only the paragraph's own runs and hyperlink runs count, the same set as
+    CT_P.text, so text boxes and nested content controls are left out.
+    """
+    parts = []
+    for elem in p:
+        if elem.tag == _W_R:
+            runs = (elem,)
+        elif elem.tag == _W_HYPERLINK:
+            runs = elem.findall(_W_R)
+        else:
+            continue
+        for run in runs:
+            for child in run:
+                if child.tag == _W_T:
+                    parts.append(child.text or '')
+                elif child.tag == _W_TAB:
+                    parts.append('\t')
+                elif child.tag in (_W_BR, _W_CR):
+                    parts.append('\n')
+    return ''.join(parts)
+
+
+def _table_rows(tbl: ET.Element) -> list[list[str]]:
+    """Get the stripped cell texts of each row in a <w:tbl> element."""
+    rows = []
+    for tr in tbl.findall(_W_TR):
+        cells = []
+        for tc in tr.findall(_W_TC):
+            text = '\n'.join(_paragraph_text(p) for p in tc.findall(_W_P)).strip()
+            # Horizontally merged cells are repeated, matching python-docx row.cells
+            span = tc.find(f'{_W_TCPR}/{_W_GRIDSPAN}')
+            cells.extend([text] * (int(span.get(_W_VAL, 1)) if span is not None else 1))
+        rows.append(cells)
+    return rows
+
+
+def _read_blocks_xml(file_path: Path) -> tuple[list[str], list[list[list[str]]]]:
+    """
+    Read body paragraph texts and table cell texts straight from word/document.xml.
+    
+    Streams the XML and clears each top-level block once read, so no
+    python-docx object model is built.
     
-    Args:
-        doc: The Word document
-        
     Returns:
-        List of movie titles found next to checkboxes
+        Tuple of (paragraph texts, tables as rows of cell texts)
     """
-    movies = []
-    checkbox_pattern = r'[☐□○◯☑✓✔\[\]\(\)]'
+    with zipfile.ZipFile(file_path) as zf:
+        data = zf.read('word/document.xml')
     
-    # Check paragraphs for checkbox + movie patterns
-    for para in doc.paragraphs:
-        text = para.text.strip()
-        if not text:
+    paragraphs: list[str] = []
+    tables: list[list[list[str]]] = []
+    depth = 0
+    body_depth = None
+    for event, elem in ET.iterparse(io.BytesIO(data), events=("start", "end")):
+        if event == "start":
+            depth += 1
+            if elem.tag == _W_BODY:
+                body_depth = depth
             continue
         
-        # Look for checkbox characters followed by text
-        if re.search(checkbox_pattern, text):
-            # Extract the text after the checkbox
-            movie_text = re.sub(checkbox_pattern, '', text).strip()
-            # Clean up common separators
-            movie_text = re.sub(r'^[\s\-–—:]+', '', movie_text).strip()
-            if movie_text and len(movie_text) > 1:
-                movies.append(movie_text)
-    
-    # Check tables for checkbox patterns
-    for table in doc.tables:
-        for row in table.rows:
-            row_text = ' '.join(cell.text.strip() for cell in row.cells)
-            if re.search(checkbox_pattern, row_text):
-                # Extract movie name from the row
-                movie_text = re.sub(checkbox_pattern, '', row_text).strip()
-                movie_text = re.sub(r'^[\s\-–—:]+', '', movie_text).strip()
-                if movie_text and len(movie_text) > 1:
-                    movies.append(movie_text)
-    
-    return movies
+        # Only top-level blocks of the body, like doc.paragraphs / doc.tables
+        if body_depth is not None and depth == body_depth + 1:
+            if elem.tag == _W_P:
+                paragraphs.append(_paragraph_text(elem))
+                elem.clear()
+            elif elem.tag == _W_TBL:
+                tables.append(_table_rows(elem))
+                elem.clear()
+        depth -= 1
+    
+    return paragraphs, tables
 
 
-def inspect_form_structure(session: Session) -> dict:
+def _read_blocks_docx(file_path: Path) -> tuple[list[str], list[list[list[str]]]]:
+    """Read body paragraph texts and table cell texts using python-docx."""
+    doc = Document(file_path)
+    paragraphs = [para.text for para in doc.paragraphs]
+    tables = [
+        [[cell.text.strip() for cell in row.cells] for row in table.rows]
+        for table in doc.tables
+    ]
+    return paragraphs, tables
+
+
+def _scan_for_movie(text: str, out: list[str]) -> None:
     """
-    Inspect the uploaded document to identify form fields and structure.
+    Append the movie title next to a checkbox in a paragraph or table row.
     
-    Returns a dictionary describing the form structure including:
-    - Detected placeholder fields (Name, Street, etc.)
-    - Whether a movie table exists
-    - Whether a checkbox movie list exists
-    - Available movie options if present
+    Args:
+        text: Paragraph text or space-joined table row text
+        out: List collecting the movie titles found so far
     """
-    doc = Document(session.file_path)
-    structure = FormStructure()
+    # Look for checkbox characters followed by text
+    if not _CHECKBOX_SET.isdisjoint(text):
+        # Extract the text after the checkbox
+        movie_text = text.translate(_CHECKBOX_TRANSLATE).strip()
+        # Clean up common separators
+        movie_text = _LEAD_SEP_RE.sub('', movie_text).strip()
+        if movie_text and len(movie_text) > 1:
+            out.append(movie_text)
+
+
+@functools.lru_cache(maxsize=128)
+def _cached_inspect(path_str: str, mtime_ns: int, size: int) -> tuple[FormStructure, dict]:
+    """
+    Parse a document and build its form structure and agent response.
     
-    # Patterns to match common field labels
-    field_patterns = {
-        "name": r"(?i)\b(name|full\s*name|customer\s*name)\s*[:：]?\s*[_\s]*",
-        "street": r"(?i)\b(street|address|street\s*address)\s*[:：]?\s*[_\s]*",
-        "postal_city": r"(?i)\b(postal\s*code|zip|city|postal\s*code\s*and\s*city|zip\s*code)\s*[:：]?\s*[_\s]*",
-        "country": r"(?i)\b(country|nation)\s*[:：]?\s*[_\s]*"
-    }
+    Keyed on the file's modification time and size as well as its path, so
+    a replaced file is parsed again. Callers must copy the results before
+    handing them out since they are shared by every cache hit.
+    
+    Returns:
+        Tuple of (detected form structure, response dictionary)
+    """
+    file_path = Path(path_str)
+    try:
+        paragraphs, tables = _read_blocks_xml(file_path)
+    except (KeyError, zipfile.BadZipFile, ET.ParseError):
+        # Fall back to python-docx for documents we can't parse directly
+        paragraphs, tables = _read_blocks_docx(file_path)
+    
+    structure = FormStructure()
+    movie_options: list[str] = []
     
-    # Scan paragraphs for field placeholders
-    for para in doc.paragraphs:
-        text = para.text.strip()
+    # Single pass over paragraphs: field placeholders and checkbox movies
+    for para_text in paragraphs:
+        text = para_text.strip()
         if not text:
             continue
             
-        for field_name, pattern in field_patterns.items():
-            if re.search(pattern, text):
-                if field_name == "name":
-                    structure.has_name_field = True
-                    structure.placeholders["name"] = text
-                elif field_name == "street":
-                    structure.has_street_field = True
-                    structure.placeholders["street"] = text
-                elif field_name == "postal_city":
-                    structure.has_postal_city_field = True
-                    structure.placeholders["postal_city"] = text
-                elif field_name == "country":
-                    structure.has_country_field = True
-                    structure.placeholders["country"] = text
-    
-    # Scan tables for movie list
-    for table_idx, table in enumerate(doc.tables):
-        headers = []
-        if len(table.rows) > 0:
-            for cell in table.rows[0].cells:
-                headers.append(cell.text.strip().lower())
-        
-        # Check if this looks like a movie table
-        has_title = any("title" in h for h in headers)
-        has_language = any("language" in h or "lang" in h for h in headers)
+        for field_name, rx in _FIELD_RES.items():
+            if rx.search(text):
+                setattr(structure, _FIELD_FLAGS[field_name], True)
+                structure.placeholders[field_name] = text
         
-        if has_title and has_language:
-            structure.has_movie_table = True
-            structure.movie_table_index = table_idx
-            break
+        _scan_for_movie(text, movie_options)
+    
+    # Single pass over tables: movie table header and checkbox rows
+    for table_idx, rows in enumerate(tables):
+        for row_idx, cell_texts in enumerate(rows):
+            # Check if the first table with Title/Language headers is a movie table
+            if row_idx == 0 and not structure.has_movie_table:
+                headers = [text.lower() for text in cell_texts]
+                has_title = any("title" in h for h in headers)
+                has_language = any("language" in h or "lang" in h for h in headers)
+                if has_title and has_language:
+                    structure.has_movie_table = True
+                    structure.movie_table_index = table_idx
+            
+            _scan_for_movie(' '.join(cell_texts), movie_options)
     
-    # Check for checkbox-based movie list
-    movie_options = _extract_movie_options(doc)
     has_checkbox_list = len(movie_options) > 0
     
     # Store checkbox info in structure
     structure.has_checkbox_list = has_checkbox_list
     structure.available_movies = movie_options
     
-    # Store structure in session
-    session.form_structure = structure
-    
     # Build response for the agent
     detected_fields = []
     if structure.has_name_field:
@@ -143,7 +233,7 @@ def inspect_form_structure(session: Session) -> dict:
     
     movie_message = ' and '.join(movie_info) if movie_info else 'no movie section'
     
-    return {
+    response = {
         "success": True,
         "detected_fields": detected_fields,
         "has_movie_table": structure.has_movie_table,
@@ -151,4 +241,36 @@ def inspect_form_structure(session: Session) -> dict:
         "available_movies": movie_options if has_checkbox_list else [],
         "message": f"Found {len(detected_fields)} address fields and {movie_message}."
     }
+    return structure, response
+
+
+def inspect_form_structure(session: Session) -> dict:
+    """
+    Inspect the uploaded document to identify form fields and structure.
+    
+    Results are cached per file, so repeated calls only re-parse the
+    document when it has changed on disk.
+    
+    Returns a dictionary describing the form structure including:
+    - Detected placeholder fields (Name, Street, etc.)
+    - Whether a movie table exists
+    - Whether a checkbox movie list exists
+    - Available movie options if present
+    """
+    stat = session.file_path.stat()
+    structure, response = _cached_inspect(str(session.file_path), stat.st_mtime_ns, stat.st_size)
+    
+    # Store a private copy in the session so mutations don't leak into the cache
+    session.form_structure = copy.deepcopy(structure)
+    
+    return copy.deepcopy(response)
+
 
+async def ainspect_form_structure(session: Session) -> dict:
+    """
+    Async version of inspect_form_structure.
+    
+    Runs the document parse in a worker thread so it doesn't block the
+    event loop serving other sessions.
+    """
+    return await asyncio.to_thread(inspect_form_structure, session)
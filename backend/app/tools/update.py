@@ -1,11 +1,23 @@
 """Tool for updating the order document with collected data."""
 
+import io
+import posixpath
 import re
+import zipfile
+from urllib.parse import unquote
+from contextlib import ExitStack
+from dataclasses import dataclass
 from pathlib import Path
 from copy import deepcopy
 from docx import Document
+from docx.document import Document as DocxDocument
 from docx.table import Table
+from docx.text.paragraph import Paragraph
+from docx.oxml import OxmlElement
 from docx.oxml.ns import qn
+from docx.oxml.parser import element_class_lookup
+from docx.opc.constants import RELATIONSHIP_TYPE as RT
+from docx.opc.pkgwriter import PackageWriter
 from lxml import etree
 try:
     from mailmerge import MailMerge
@@ -14,13 +26,100 @@ except ImportError:
     HAS_MAILMERGE = False
     MailMerge = None
 
-from app.session import Session
+from app.session import FormData, Session
 
 
 # Checkbox unicode characters
 UNCHECKED_BOXES = ['☐', '□', '○', '◯', '( )', '[ ]']
 CHECKED_BOX = '☑'
 
+# Single-glyph boxes are swapped in one C-level pass; bracket pairs need replace()
+_CHECKBOX_TRANS = str.maketrans({box: CHECKED_BOX for box in UNCHECKED_BOXES if len(box) == 1})
+_BRACKET_BOXES = [box for box in UNCHECKED_BOXES if len(box) > 1]
+_RX_UNCHECKED = re.compile('|'.join(re.escape(box) for box in UNCHECKED_BOXES))
+
+# Required FormData fields and how they are named to the user
+_REQUIRED: tuple[tuple[str, str], ...] = (
+    ('name', 'Name'),
+    ('street', 'Street'),
+    ('postal_code_city', 'Postal Code and City'),
+    ('country', 'Country'),
+    ('movies', 'Movies'),
+)
+
+# Text placeholder patterns, compiled once since they run for every paragraph.
+# Sections are told apart with one search and field labels with one match;
+# the named group that matched says which field the line holds and ends
+# where the value starts.
+_RX_SECTION = re.compile(r"(?P<movies>movies?\s*ordered)|(?P<customer>customer\s*info)", re.I)
+_RX_FIELD = re.compile(
+    r"\s*(?:"
+    r"(?P<name>name\s*[:：]\s*)"
+    r"|(?P<title>title\s*[:：]\s*)"
+    r"|(?P<street>street\s*[:：]\s*)"
+    r"|(?P<country>country\s*[:：]\s*)"
+    r"|(?P<language>language\s*[:：]\s*)"
+    r"|(?P<postal>(?=postal|zip|city).*?"
+    r"(?:postal\s*code|zip\s*code?|city)(?:\s*(?:and|&)\s*(?:city|postal\s*code))?\s*[:：]\s*)"
+    r").*",
+    re.I
+)
+_RX_COMBINED = re.compile(r"((?:name|title)\s*[:：]\s*)[^:]*?(language\s*[:：]\s*).*", re.I)
+
+# Customer field labels -> FormData attribute
+_CUSTOMER_FIELDS = {
+    'name': 'name',
+    'street': 'street',
+    'postal': 'postal_code_city',
+    'country': 'country',
+}
+
+# Content control (SDT) lookups, compiled once and evaluated by lxml in C
+NSMAP = {'w': 'http://schemas.openxmlformats.org/wordprocessingml/2006/main'}
+_XP_SDT_TAG = etree.XPath('string(w:sdtPr/w:tag/@w:val)', namespaces=NSMAP)
+_XP_SDT_ALIAS = etree.XPath('string(w:sdtPr/w:alias/@w:val)', namespaces=NSMAP)
+_XP_SDT_TEXT = etree.XPath('w:sdtContent//w:t', namespaces=NSMAP)
+
+# Run text of a paragraph and of a table row's cell paragraphs, collected by
+# lxml rather than python-docx. Like CT_P.text, only a paragraph's own runs and
+# hyperlink runs count, not text boxes or nested content controls.
+_XP_PARA_TEXT = etree.XPath('w:r/w:t/text() | w:hyperlink/w:r/w:t/text()', namespaces=NSMAP)
+_XP_ROW_TEXT = etree.XPath(
+    'w:tc/w:p/w:r/w:t/text() | w:tc/w:p/w:hyperlink/w:r/w:t/text()', namespaces=NSMAP
+)
+
+# Mail merge field and content control tag/alias names (lowercased) -> the
+# FormData attribute or movie key they hold. Numbered mail merge movie
+# fields (MovieTitle2, movie_title_2) are looked up without their suffix.
+_FIELD_ALIASES = {
+    **dict.fromkeys(['name', 'customername', 'customer_name', 'fullname', 'full_name'], 'name'),
+    **dict.fromkeys(['street', 'address', 'streetaddress', 'street_address'], 'street'),
+    **dict.fromkeys(['postalcodecity', 'postal_code_city', 'postalcode', 'postal_code',
+                     'city', 'zipcity', 'zip_city', 'zip'], 'postal_code_city'),
+    **dict.fromkeys(['country', 'nation'], 'country'),
+    **dict.fromkeys(['movietitle', 'movie_title', 'title', 'moviename', 'movie_name'], 'title'),
+    **dict.fromkeys(['movielanguage', 'movie_language', 'language', 'lang'], 'language'),
+}
+_MOVIE_KEYS = ('title', 'language')
+
+# Splits a mail merge field name into its stem and optional movie number
+_MOVIE_FIELD_RX = re.compile(r"(?P<stem>.*?)_?(?P<number>\d*)")
+
+# Elements the single fill pass dispatches on
+_W_BODY = qn('w:body')
+_W_SDT = qn('w:sdt')
+_W_P = qn('w:p')
+_W_TBL = qn('w:tbl')
+
+# Documents whose main part is larger than this (uncompressed) are filled by
+# streaming it block by block instead of loading it whole
+STREAM_THRESHOLD = 8 * 1024 * 1024
+_PACKAGE_RELS = '_rels/.rels'
+
+# Filled documents are written once and served right away, so deflate them at
+# the fastest level; higher levels cost far more CPU for little size gain
+FAST_SAVE = True
+
 
 def update_order_document(
     session: Session,
@@ -58,21 +157,13 @@ def update_order_document(
     if movies is not None:
         form_data.movies = movies
     
-    # Check completion status
-    session.is_complete = form_data.is_complete()
-    
-    # Build response
-    missing_fields = []
-    if not form_data.name:
-        missing_fields.append("Name")
-    if not form_data.street:
-        missing_fields.append("Street")
-    if not form_data.postal_code_city:
-        missing_fields.append("Postal Code and City")
-    if not form_data.country:
-        missing_fields.append("Country")
-    if not form_data.movies:
-        missing_fields.append("Movies")
+    # Any previously generated document is now stale
+    if any(value is not None for value in (name, street, postal_code_city, country, movies)):
+        session.cached_output = None
+    
+    # Build response; the form is complete once nothing is missing
+    missing_fields = [label for attr, label in _REQUIRED if not getattr(form_data, attr)]
+    session.is_complete = not missing_fields
     
     return {
         "success": True,
@@ -97,6 +188,7 @@ def add_movie(session: Session, title: str, language: str) -> dict:
     """
     movie = {"title": title.strip(), "language": language.strip()}
     session.form_data.movies.append(movie)
+    session.cached_output = None
     
     # Check completion status
     session.is_complete = session.form_data.is_complete()
@@ -121,257 +213,412 @@ def _get_merge_fields(file_path: Path) -> list[str]:
         return []
 
 
-def _fill_with_mailmerge(file_path: Path, output_path: Path, form_data, movies: list[dict]) -> bool:
+def _fill_with_mailmerge(file_path: Path, form_data, movies: list[dict]) -> tuple[bool, DocxDocument | None]:
     """
     Try to fill document using mail merge fields.
     
-    Returns True if successful, False if no merge fields found.
+    The merged package is written to memory and loaded straight into
+    python-docx, so post-processing doesn't reread it from disk.
+    
+    Returns (True, merged document) if successful, (False, None) if no
+    merge fields were found or filled.
     """
     if not HAS_MAILMERGE:
-        return False
+        return False, None
     try:
         with MailMerge(file_path) as doc:
             merge_fields = doc.get_merge_fields()
             
             if not merge_fields:
-                return False
+                return False, None
             
             # Build merge data - map common field names
             merge_data = {}
             
             # Customer fields - try various common names
-            name_fields = ['Name', 'name', 'CustomerName', 'customer_name', 'FullName', 'full_name']
-            street_fields = ['Street', 'street', 'Address', 'address', 'StreetAddress', 'street_address']
-            postal_fields = ['PostalCodeCity', 'postal_code_city', 'PostalCode', 'postal_code', 
-                           'City', 'city', 'ZipCity', 'zip_city', 'Zip', 'zip']
-            country_fields = ['Country', 'country', 'Nation', 'nation']
-            
+            customer_values = _field_values(form_data, [])
             for field in merge_fields:
-                if field in name_fields and form_data.name:
-                    merge_data[field] = form_data.name
-                elif field in street_fields and form_data.street:
-                    merge_data[field] = form_data.street
-                elif field in postal_fields and form_data.postal_code_city:
-                    merge_data[field] = form_data.postal_code_city
-                elif field in country_fields and form_data.country:
-                    merge_data[field] = form_data.country
+                value = customer_values.get(_FIELD_ALIASES.get(field.lower()))
+                if value:
+                    merge_data[field] = value
             
-            # Movie fields - handle multiple movies
-            for i, movie in enumerate(movies):
-                idx = i + 1
-                title = movie.get("title", "")
-                language = movie.get("language", "")
-                
-                # Try various movie field naming conventions
-                title_names = [f'MovieTitle{idx}', f'movie_title_{idx}', f'Title{idx}', f'title_{idx}',
-                              'MovieTitle', 'movie_title', 'Title', 'title', 'MovieName', 'movie_name']
-                lang_names = [f'MovieLanguage{idx}', f'movie_language_{idx}', f'Language{idx}', f'language_{idx}',
-                             'MovieLanguage', 'movie_language', 'Language', 'language', 'Lang', 'lang']
-                
-                for field in merge_fields:
-                    if field in title_names and title:
-                        merge_data[field] = title
-                    elif field in lang_names and language:
-                        merge_data[field] = language
+            # Movie fields - handle multiple movies. MovieTitle2 / movie_title_2
+            # target one movie; unnumbered fields get the last movie's value.
+            last_values = {
+                key: next((movie[key] for movie in reversed(movies) if movie.get(key)), None)
+                for key in _MOVIE_KEYS
+            }
+            for field in merge_fields:
+                m = _MOVIE_FIELD_RX.fullmatch(field)
+                key = _FIELD_ALIASES.get(m['stem'].lower())
+                if key not in _MOVIE_KEYS:
+                    continue
+                if not m['number']:
+                    value = last_values[key]
+                elif 1 <= int(m['number']) <= len(movies):
+                    value = movies[int(m['number']) - 1].get(key)
+                else:
+                    continue
+                if value:
+                    merge_data[field] = value
             
             if merge_data:
                 doc.merge(**merge_data)
-                doc.write(output_path)
-                return True
+                buffer = io.BytesIO()
+                doc.write(buffer)
+                buffer.seek(0)
+                return True, Document(buffer)
             
-            return False
+            return False, None
     except Exception as e:
         print(f"Mailmerge error: {e}")
-        return False
+        return False, None
 
 
-def _fill_content_controls(doc: Document, form_data, movies: list[dict]) -> bool:
+def _field_values(form_data, movies: list[dict]) -> dict[str, str]:
     """
-    Fill content control (SDT) fields in the document.
+    Collect the values to fill, keyed like the targets of _FIELD_ALIASES.
     
-    Returns True if any fields were filled.
+    Movie keys come from the first movie, for single-movie fields.
     """
-    filled = False
-    
-    # XML namespaces
-    nsmap = {
-        'w': 'http://schemas.openxmlformats.org/wordprocessingml/2006/main',
-        'w14': 'http://schemas.microsoft.com/office/word/2010/wordml'
+    values = {
+        'name': form_data.name,
+        'street': form_data.street,
+        'postal_code_city': form_data.postal_code_city,
+        'country': form_data.country,
     }
-    
-    # Field mappings (tag/alias -> value)
-    field_values = {}
-    if form_data.name:
-        field_values.update({'name': form_data.name, 'Name': form_data.name, 
-                            'CustomerName': form_data.name, 'customer_name': form_data.name})
-    if form_data.street:
-        field_values.update({'street': form_data.street, 'Street': form_data.street,
-                            'address': form_data.street, 'Address': form_data.street})
-    if form_data.postal_code_city:
-        field_values.update({'postal_code_city': form_data.postal_code_city, 
-                            'PostalCodeCity': form_data.postal_code_city,
-                            'city': form_data.postal_code_city, 'City': form_data.postal_code_city,
-                            'postal_code': form_data.postal_code_city, 'PostalCode': form_data.postal_code_city,
-                            'zip': form_data.postal_code_city, 'Zip': form_data.postal_code_city})
-    if form_data.country:
-        field_values.update({'country': form_data.country, 'Country': form_data.country})
-    
-    # Add movie fields
     if movies:
-        movie = movies[0]  # First movie for single-movie fields
-        title = movie.get("title", "")
-        language = movie.get("language", "")
-        if title:
-            field_values.update({'MovieTitle': title, 'movie_title': title, 
-                                'Title': title, 'title': title,
-                                'MovieName': title, 'movie_name': title})
-        if language:
-            field_values.update({'MovieLanguage': language, 'movie_language': language,
-                                'Language': language, 'language': language,
-                                'Lang': language, 'lang': language})
-    
-    # Find and fill SDT elements
-    for sdt in doc.element.iter(qn('w:sdt')):
-        # Get the tag/alias of this content control
-        sdt_pr = sdt.find('.//w:sdtPr', nsmap)
-        if sdt_pr is None:
+        values['title'] = movies[0].get("title", "")
+        values['language'] = movies[0].get("language", "")
+    return {key: value for key, value in values.items() if value}
+
+
+def _content_control_attr(sdt, field_values: dict[str, str]) -> str | None:
+    """Get the field_values key a content control is filled with, preferring its tag over its alias."""
+    tag_name = _XP_SDT_TAG(sdt) or _XP_SDT_ALIAS(sdt)
+    attr = _FIELD_ALIASES.get(tag_name.lower())
+    return attr if field_values.get(attr) else None
+
+
+def _content_control_attrs(root, field_values: dict[str, str]) -> set[str]:
+    """
+    Get the field_values keys that content controls under root leave filled in.
+    
+    Controls are filled outermost first, so a control's value only survives
+    if its first text element doesn't sit inside a nested control that is
+    filled after it.
+    """
+    attrs = set()
+    for sdt in root.iter(_W_SDT):
+        attr = _content_control_attr(sdt, field_values)
+        text_elems = _XP_SDT_TEXT(sdt) if attr else None
+        if not text_elems:
             continue
-        
-        # Check tag element
-        tag_elem = sdt_pr.find('.//w:tag', nsmap)
-        alias_elem = sdt_pr.find('.//w:alias', nsmap)
-        
-        tag_name = None
-        if tag_elem is not None:
-            tag_name = tag_elem.get(qn('w:val'))
-        elif alias_elem is not None:
-            tag_name = alias_elem.get(qn('w:val'))
-        
-        if tag_name and tag_name in field_values:
-            # Find the text content element and update it
-            sdt_content = sdt.find('.//w:sdtContent', nsmap)
-            if sdt_content is not None:
-                # Find text runs and update
-                for run in sdt_content.iter(qn('w:r')):
-                    for text_elem in run.iter(qn('w:t')):
-                        text_elem.text = field_values[tag_name]
-                        filled = True
-                        break
+        for owner in text_elems[0].iterancestors(_W_SDT):
+            if owner is sdt:
+                attrs.add(attr)
+                break
+            if _content_control_attr(owner, field_values):
+                break
+    return attrs
+
+
+def _fill_content_control(sdt, field_values: dict[str, str]) -> bool:
+    """
+    Fill a single content control (SDT) element, preferring its tag over its alias.
+    
+    Returns True if the control was filled.
+    """
+    attr = _content_control_attr(sdt, field_values)
+    if attr is None:
+        return False
     
-    return filled
+    # Put the value in the first text element and clear the rest, so
+    # placeholder text split across runs isn't left behind or repeated
+    text_elems = _XP_SDT_TEXT(sdt)
+    if not text_elems:
+        return False
+    text_elems[0].text = field_values[attr]
+    for text_elem in text_elems[1:]:
+        text_elem.text = ''
+    return True
 
 
 def _replace_unicode_checkbox(text: str, should_check: bool = True) -> str:
     """Replace unicode unchecked box with checked box."""
-    result = text
-    for unchecked in UNCHECKED_BOXES:
-        if unchecked in result:
-            result = result.replace(unchecked, CHECKED_BOX if should_check else unchecked)
+    if not should_check:
+        return text
+    result = text.translate(_CHECKBOX_TRANS)
+    if '(' in result or '[' in result:
+        for unchecked in _BRACKET_BOXES:
+            result = result.replace(unchecked, CHECKED_BOX)
     return result
 
 
+def _title_pattern(movie_titles: list[str]) -> re.Pattern | None:
+    """Compile one pattern matching any of the movie titles in lowercased text."""
+    titles_lower = [t.lower().strip() for t in movie_titles]
+    if not titles_lower:
+        return None
+    return re.compile('|'.join(re.escape(t) for t in titles_lower))
+
+
+def _tick_paragraph(para: Paragraph, title_rx: re.Pattern) -> None:
+    """Tick checkboxes in a paragraph that mentions one of the movie titles."""
+    text = ''.join(_XP_PARA_TEXT(para._p))
+    # Most matching paragraphs have no box to tick; skip their runs
+    if title_rx.search(text.lower()) and _RX_UNCHECKED.search(text):
+        for run in para.runs:
+            run.text = _replace_unicode_checkbox(run.text)
+
+
+def _tick_table(table: Table, title_rx: re.Pattern) -> None:
+    """Tick checkboxes in table rows that mention one of the movie titles."""
+    for row in table.rows:
+        row_text = ''.join(_XP_ROW_TEXT(row._tr))
+        if title_rx.search(row_text.lower()) and _RX_UNCHECKED.search(row_text):
+            for cell in row.cells:
+                for para in cell.paragraphs:
+                    for run in para.runs:
+                        run.text = _replace_unicode_checkbox(run.text)
+
+
 def _tick_movie_checkboxes(doc: Document, movie_titles: list[str]) -> None:
     """Find and tick checkboxes next to movie titles in the document."""
-    titles_lower = [t.lower().strip() for t in movie_titles]
+    title_rx = _title_pattern(movie_titles)
+    if title_rx is None:
+        return
     
     # Check paragraphs for checkbox patterns
     for para in doc.paragraphs:
-        text = para.text
-        text_lower = text.lower()
-        
-        for title in titles_lower:
-            if title in text_lower:
-                for run in para.runs:
-                    run.text = _replace_unicode_checkbox(run.text)
-                break
+        _tick_paragraph(para, title_rx)
     
     # Check tables for checkbox patterns
     for table in doc.tables:
-        for row in table.rows:
-            row_text = ' '.join(cell.text for cell in row.cells).lower()
-            for title in titles_lower:
-                if title in row_text:
-                    for cell in row.cells:
-                        for para in cell.paragraphs:
-                            for run in para.runs:
-                                run.text = _replace_unicode_checkbox(run.text)
-                    break
-
-
-def _fill_text_placeholders(doc: Document, form_data, movies: list[dict]) -> None:
+        _tick_table(table, title_rx)
+
+
+def _splice_value(text: str, m: re.Match, group: str, value: str) -> str:
+    """Put value right after a matched label group, replacing the rest of its line."""
+    return ''.join((text[:m.end(group)], value, text[m.end():]))
+
+
+@dataclass(slots=True)
+class _FillState:
+    """State carried across paragraphs by the single fill pass."""
+    form_data: FormData
+    movies: list[dict]
+    field_values: dict[str, str]
+    title_rx: re.Pattern | None
+    # Cleared when content controls already hold every provided field
+    fill_placeholders: bool = True
+    section: str = "customer"
+    movie_idx: int = 0
+
+
+def _fill_paragraph_placeholders(para: Paragraph, state: _FillState) -> None:
     """
-    Fill document by replacing text placeholders.
+    Fill text placeholders in a body paragraph.
     Section-aware to avoid mixing customer and movie fields.
     """
-    current_section = "customer"
-    movie_idx = 0
+    form_data = state.form_data
+    movies = state.movies
     
-    for para in doc.paragraphs:
-        text = para.text.strip()
-        
-        # Detect section changes
-        if re.search(r"(?i)movies?\s*ordered", text):
-            current_section = "movies"
-            continue
-        elif re.search(r"(?i)customer\s*info", text):
-            current_section = "customer"
-            continue
-        
-        original_text = para.text
-        new_text = original_text
-        
-        if current_section == "customer":
-            # Replace customer fields
-            if form_data.name and re.search(r"(?i)^name\s*[:：]", text):
-                new_text = re.sub(r"(?i)(name\s*[:：]\s*)(.*)", r"\1" + form_data.name, new_text)
-            
-            if form_data.street and re.search(r"(?i)^street\s*[:：]", text):
-                new_text = re.sub(r"(?i)(street\s*[:：]\s*)(.*)", r"\1" + form_data.street, new_text)
-            
-            if form_data.postal_code_city:
-                if re.search(r"(?i)^(postal|zip|city)", text):
-                    new_text = re.sub(
-                        r"(?i)((?:postal\s*code|zip\s*code?|city)(?:\s*(?:and|&)\s*(?:city|postal\s*code))?\s*[:：]\s*)(.*)",
-                        r"\1" + form_data.postal_code_city,
-                        new_text
-                    )
-            
-            if form_data.country and re.search(r"(?i)^country\s*[:：]", text):
-                new_text = re.sub(r"(?i)(country\s*[:：]\s*)(.*)", r"\1" + form_data.country, new_text)
+    text = para.text
+    
+    # Detect section changes
+    m = _RX_SECTION.search(text)
+    if m:
+        state.section = m.lastgroup
+        return
+    
+    new_text = text
+    
+    if state.section == "customer":
+        # Replace customer fields, keeping the label and anything after the line
+        m = _RX_FIELD.match(text)
+        attr = _CUSTOMER_FIELDS.get(m.lastgroup) if m else None
+        value = getattr(form_data, attr) if attr else None
+        if value:
+            new_text = _splice_value(text, m, m.lastgroup, value)
+    
+    elif state.section == "movies" and movies and state.movie_idx < len(movies):
+        movie = movies[state.movie_idx]
         
-        elif current_section == "movies" and movies and movie_idx < len(movies):
-            movie = movies[movie_idx]
-            
-            # Handle combined Name: ... Language: ... on same line
-            if re.search(r"(?i)(name|title)\s*[:：]", text) and re.search(r"(?i)language\s*[:：]", text):
+        # Handle combined Name: ... Language: ... on same line
+        m = _RX_COMBINED.search(text)
+        if m:
+            title = movie.get("title", "")
+            language = movie.get("language", "")
+            # Replace both on the same line, joining the kept spans in one go
+            new_text = ''.join((
+                text[:m.end(1)], title, text[m.start(2):m.end(2)], language, text[m.end():]
+            ))
+            state.movie_idx += 1
+        else:
+            # Handle separate lines
+            m = _RX_FIELD.match(text)
+            field = m.lastgroup if m else None
+            if field in ("name", "title"):
                 title = movie.get("title", "")
+                new_text = _splice_value(text, m, field, title)
+            elif field == "language":
                 language = movie.get("language", "")
-                # Replace both on the same line
-                new_text = re.sub(
-                    r"(?i)((name|title)\s*[:：]\s*)([^:]*?)(language\s*[:：]\s*)(.*)",
-                    r"\1" + title + r"\4" + language,
-                    new_text
-                )
-                movie_idx += 1
-            else:
-                # Handle separate lines
-                if re.search(r"(?i)^(name|title)\s*[:：]", text):
-                    title = movie.get("title", "")
-                    new_text = re.sub(r"(?i)((name|title)\s*[:：]\s*)(.*)", r"\1" + title, new_text)
-                
-                if re.search(r"(?i)^language\s*[:：]", text):
-                    language = movie.get("language", "")
-                    new_text = re.sub(r"(?i)(language\s*[:：]\s*)(.*)", r"\1" + language, new_text)
-                    movie_idx += 1
-        
-        # Apply changes
-        if new_text != original_text:
-            for run in para.runs:
+                new_text = _splice_value(text, m, field, language)
+                state.movie_idx += 1
+    
+    # Apply changes
+    if new_text != text:
+        runs = para.runs
+        if runs:
+            runs[0].text = new_text
+            for run in runs[1:]:
                 run.text = ""
-            if para.runs:
-                para.runs[0].text = new_text
-            else:
-                para.add_run(new_text)
+        else:
+            para.add_run(new_text)
+
+
+def _fill_block(block, state: _FillState, parent=None) -> None:
+    """
+    Fill a top-level body block (paragraph, table or content control).
+    
+    Controls inside the block are filled first, in document order so an
+    outer control's blanking never wipes a nested control filled before it,
+    then the paragraph gets its placeholders replaced and its movie
+    checkboxes ticked, or the table its movie rows ticked.
+    """
+    for sdt in block.iter(_W_SDT):
+        _fill_content_control(sdt, state.field_values)
+    
+    if block.tag == _W_P:
+        para = Paragraph(block, parent)
+        if state.fill_placeholders:
+            _fill_paragraph_placeholders(para, state)
+        if state.title_rx is not None:
+            _tick_paragraph(para, state.title_rx)
+    elif block.tag == _W_TBL and state.title_rx is not None:
+        _tick_table(Table(block, parent), state.title_rx)
+
+
+class _ZipPackageWriter:
+    """Physical package writer for python-docx's PackageWriter using our zip settings."""
+    
+    def __init__(self, pkg_file):
+        self._zipf = _open_output_zip(pkg_file)
+    
+    def write(self, pack_uri, blob):
+        self._zipf.writestr(pack_uri.membername, blob)
+    
+    def close(self):
+        self._zipf.close()
+
+
+def _open_output_zip(pkg_file) -> zipfile.ZipFile:
+    """Open an output .docx archive for writing, honouring FAST_SAVE."""
+    return zipfile.ZipFile(pkg_file, 'w', zipfile.ZIP_DEFLATED, compresslevel=1 if FAST_SAVE else None)
+
+
+def _save_document(doc: Document, output_path: Path) -> None:
+    """Save a python-docx document like doc.save(), honouring FAST_SAVE."""
+    if not FAST_SAVE:
+        doc.save(output_path)
+        return
+    
+    # Same steps as OpcPackage.save() / PackageWriter.write(), with our writer
+    package = doc.part.package
+    for part in package.parts:
+        part.before_marshal()
+    writer = _ZipPackageWriter(output_path)
+    try:
+        PackageWriter._write_content_types_stream(writer, package.parts)
+        PackageWriter._write_pkg_rels(writer, package.rels)
+        PackageWriter._write_parts(writer, package.parts)
+    finally:
+        writer.close()
+
+
+def _main_part(zf: zipfile.ZipFile) -> zipfile.ZipInfo | None:
+    """
+    Find the main document part through the package's officeDocument relationship.
+    
+    It is usually word/document.xml but doesn't have to be. Returns None if
+    the relationship or its target can't be found.
+    """
+    try:
+        rels = etree.fromstring(zf.read(_PACKAGE_RELS), etree.XMLParser(resolve_entities=False))
+    except (KeyError, etree.XMLSyntaxError):
+        return None
+    for rel in rels:
+        if rel.get('Type') == RT.OFFICE_DOCUMENT and rel.get('TargetMode') != 'External':
+            name = posixpath.normpath(unquote(rel.get('Target', '')).lstrip('/'))
+            try:
+                return zf.getinfo(name)
+            except KeyError:
+                return None
+    return None
+
+
+def _stream_fill(file_path: Path, output_path: Path, part_name: str, state: _FillState,
+                 movie_table_index: int | None) -> None:
+    """
+    Fill a large document without loading its whole main part.
+    
+    The main part (part_name) is parsed incrementally; each top-level block is
+    filled, written out and cleared before the next one is read. All other
+    package parts are copied over unchanged. Which fields content controls
+    cover isn't known up front here, so text placeholders are always filled.
+    """
+    with zipfile.ZipFile(file_path) as zin, _open_output_zip(output_path) as zout:
+        for item in zin.infolist():
+            # Write by name so entries pick up the output archive's compression
+            if item.filename != part_name:
+                zout.writestr(item.filename, zin.read(item))
+                continue
+            with zin.open(item) as src, zout.open(item.filename, 'w') as dst:
+                _stream_document(src, dst, state, movie_table_index)
+
+
+def _stream_document(src, dst, state: _FillState, movie_table_index: int | None) -> None:
+    """Stream-fill the main document part from src into dst."""
+    # Parse into python-docx's element classes so Paragraph/Table proxies work
+    parser = etree.XMLPullParser(events=('start', 'end'), remove_blank_text=True, resolve_entities=False)
+    parser.set_element_class_lookup(element_class_lookup)
+    
+    depth = 0
+    table_idx = 0
+    with etree.xmlfile(dst, encoding='UTF-8') as xf, ExitStack() as open_elements:
+        xf.write_declaration(standalone=True)
+        while chunk := src.read(64 * 1024):
+            parser.feed(chunk)
+            for event, elem in parser.read_events():
+                if event == 'start':
+                    depth += 1
+                    # Open the document root and body in the output as they are met
+                    if depth == 1 or (depth == 2 and elem.tag == _W_BODY):
+                        nsmap = elem.nsmap if depth == 1 else None
+                        open_elements.enter_context(xf.element(elem.tag, dict(elem.attrib), nsmap))
+                    continue
+                
+                depth -= 1
+                is_block = depth == 2 and elem.getparent().tag == _W_BODY
+                # Only body blocks and other children of the root are written
+                # whole; everything deeper goes out with its block
+                if not is_block and (depth != 1 or elem.tag == _W_BODY):
+                    continue
+                
+                if is_block:
+                    _fill_block(elem, state)
+                    if elem.tag == _W_TBL:
+                        if table_idx == movie_table_index:
+                            _fill_movie_table(Table(elem, None), state.movies)
+                        table_idx += 1
+                
+                # Write the finished block and drop it, and anything before it
+                xf.write(elem)
+                elem.clear()
+                while elem.getprevious() is not None:
+                    del elem.getparent()[0]
+        parser.close()
 
 
 def _fill_movie_table(table: Table, movies: list[dict[str, str]]) -> None:
@@ -380,8 +627,9 @@ def _fill_movie_table(table: Table, movies: list[dict[str, str]]) -> None:
     language_col = None
     name_col = None
     
-    if len(table.rows) > 0:
-        for idx, cell in enumerate(table.rows[0].cells):
+    rows = table.rows
+    if len(rows) > 0:
+        for idx, cell in enumerate(rows[0].cells):
             header = cell.text.strip().lower()
             if "title" in header:
                 title_col = idx
@@ -397,15 +645,28 @@ def _fill_movie_table(table: Table, movies: list[dict[str, str]]) -> None:
     if title_col is None or language_col is None:
         return
     
-    # Remove existing data rows (keep header)
-    while len(table.rows) > 1:
-        table._tbl.remove(table.rows[1]._tr)
+    tbl = table._tbl
     
-    # Add movies
+    # Remove existing data rows (keep header)
+    for tr in tbl.tr_lst[1:]:
+        tbl.remove(tr)
+    
+    # Build one empty row laid out like table.add_row() would, then clone it
+    # per movie and append them all at once
+    template = OxmlElement('w:tr')
+    for grid_col in tbl.tblGrid.gridCol_lst:
+        tc = template.add_tc()
+        if grid_col.w is not None:
+            tc.width = grid_col.w
+    
+    new_rows = []
     for movie in movies:
-        row = table.add_row()
-        row.cells[title_col].text = movie.get("title", "")
-        row.cells[language_col].text = movie.get("language", "")
+        tr = deepcopy(template)
+        tcs = tr.tc_lst
+        for col, value in ((title_col, movie.get("title", "")), (language_col, movie.get("language", ""))):
+            tcs[col].p_lst[0].add_r().text = value
+        new_rows.append(tr)
+    tbl.extend(new_rows)
 
 
 def generate_filled_document(session: Session) -> Path:
@@ -424,34 +685,50 @@ def generate_filled_document(session: Session) -> Path:
     output_path = session.file_path.parent / f"filled_{session.file_path.name}"
     
     # Strategy 1: Try mail merge first
-    if _fill_with_mailmerge(session.file_path, output_path, form_data, movies):
+    merged, doc = _fill_with_mailmerge(session.file_path, form_data, movies)
+    if merged:
         # Mailmerge worked, but we may need to post-process for checkboxes
-        doc = Document(output_path)
         if movies:
             movie_titles = [m.get("title", "") for m in movies]
             _tick_movie_checkboxes(doc, movie_titles)
-        doc.save(output_path)
+        _save_document(doc, output_path)
         return output_path
     
-    # Strategy 2 & 3: Use python-docx for content controls and text replacement
-    doc = Document(session.file_path)
+    # Strategy 2 & 3: content controls and text replacement, in one pass
+    state = _FillState(
+        form_data,
+        movies,
+        _field_values(form_data, movies),
+        _title_pattern([m.get("title", "") for m in movies]),
+    )
+    movie_table_index = None
+    if structure and structure.has_movie_table:
+        movie_table_index = structure.movie_table_index
+    
+    # Anything unusual about the package is left to python-docx
+    with zipfile.ZipFile(session.file_path) as zf:
+        main_part = _main_part(zf)
+    if main_part is not None and main_part.file_size > STREAM_THRESHOLD:
+        _stream_fill(session.file_path, output_path, main_part.filename, state, movie_table_index)
+        return output_path
     
-    # Try content controls first
-    _fill_content_controls(doc, form_data, movies)
+    doc = Document(session.file_path)
     
-    # Always do text placeholder replacement as fallback
-    _fill_text_placeholders(doc, form_data, movies)
+    # Text placeholders are only a fallback; skip them if content controls
+    # cover every provided field. Controls hold just the first movie, so
+    # they only cover the movie list when it has one entry.
+    covered = _content_control_attrs(doc.element, state.field_values)
+    if len(movies) == 1 and {'title', 'language'} <= covered:
+        covered.add('movies')
+    state.fill_placeholders = not form_data.filled_attrs() <= covered
     
-    # Tick checkboxes for ordered movies
-    if movies:
-        movie_titles = [m.get("title", "") for m in movies]
-        _tick_movie_checkboxes(doc, movie_titles)
+    for block in doc.element.body.iterchildren():
+        _fill_block(block, state, doc._body)
     
     # Handle structured movie table
-    if structure and structure.has_movie_table and structure.movie_table_index is not None:
-        table = doc.tables[structure.movie_table_index]
+    if movie_table_index is not None:
+        table = doc.tables[movie_table_index]
         _fill_movie_table(table, movies)
     
-    doc.save(output_path)
+    _save_document(doc, output_path)
     return output_path
-
@@ -1,5 +1,7 @@
 """Tool for validating country names."""
 
+import functools
+
 import pycountry
 
 
@@ -26,6 +28,36 @@ COUNTRY_ALIASES = {
 }
 
 
+def _build_country_index() -> dict[str, str]:
+    """Map lowercase names, official names and ISO codes to canonical names."""
+    index: dict[str, str] = {}
+    for country in pycountry.countries:
+        for key in (
+            country.name,
+            country.alpha_2,
+            country.alpha_3,
+            getattr(country, "official_name", ""),
+        ):
+            if key:
+                index.setdefault(key.lower(), country.name)
+    # Aliases take precedence, as they did when checked first
+    index.update(COUNTRY_ALIASES)
+    return index
+
+
+_COUNTRY_INDEX = _build_country_index()
+
+
+@functools.lru_cache(maxsize=4096)
+def _fuzzy_match(normalized: str) -> str | None:
+    """Return the best fuzzy pycountry match, or None if nothing matches."""
+    try:
+        results = pycountry.countries.search_fuzzy(normalized)
+    except LookupError:
+        return None
+    return results[0].name if results else None
+
+
 def validate_country(country_name: str) -> dict:
     """
     Validate if the provided string is a valid country name.
@@ -46,69 +78,30 @@ def validate_country(country_name: str) -> dict:
     country_name = country_name.strip()
     normalized = country_name.lower()
     
-    # Check aliases first
-    if normalized in COUNTRY_ALIASES:
+    # Aliases, names, official names and ISO codes
+    hit = _COUNTRY_INDEX.get(normalized)
+    if hit is not None:
         return {
             "is_valid": True,
-            "normalized_name": COUNTRY_ALIASES[normalized],
-            "message": f"Valid country: {COUNTRY_ALIASES[normalized]}"
+            "normalized_name": hit,
+            "message": f"Valid country: {hit}"
         }
     
-    # Try exact match with pycountry
-    try:
-        country = pycountry.countries.get(name=country_name)
-        if country:
-            return {
-                "is_valid": True,
-                "normalized_name": country.name,
-                "message": f"Valid country: {country.name}"
-            }
-    except (KeyError, LookupError):
-        pass
-    
     # Try fuzzy search
-    try:
-        results = pycountry.countries.search_fuzzy(country_name)
-        if results:
-            best_match = results[0]
-            # If close enough match, accept it
-            if normalized in best_match.name.lower() or best_match.name.lower() in normalized:
-                return {
-                    "is_valid": True,
-                    "normalized_name": best_match.name,
-                    "message": f"Valid country: {best_match.name}"
-                }
-            else:
-                return {
-                    "is_valid": False,
-                    "message": f"'{country_name}' is not a valid country.",
-                    "suggestion": best_match.name
-                }
-    except LookupError:
-        pass
-    
-    # Check if it's an alpha-2 or alpha-3 code
-    try:
-        country = pycountry.countries.get(alpha_2=country_name.upper())
-        if country:
-            return {
-                "is_valid": True,
-                "normalized_name": country.name,
-                "message": f"Valid country: {country.name}"
-            }
-    except (KeyError, LookupError):
-        pass
-    
-    try:
-        country = pycountry.countries.get(alpha_3=country_name.upper())
-        if country:
+    best_match = _fuzzy_match(normalized)
+    if best_match is not None:
+        # If close enough match, accept it
+        if normalized in best_match.lower() or best_match.lower() in normalized:
             return {
                 "is_valid": True,
-                "normalized_name": country.name,
-                "message": f"Valid country: {country.name}"
+                "normalized_name": best_match,
+                "message": f"Valid country: {best_match}"
             }
-    except (KeyError, LookupError):
-        pass
+        return {
+            "is_valid": False,
+            "message": f"'{country_name}' is not a valid country.",
+            "suggestion": best_match
+        }
     
     # No valid country found
     return {
@@ -116,5 +109,3 @@ def validate_country(country_name: str) -> dict:
         "message": f"'{country_name}' is not a valid country for shipping. Please provide a valid country name.",
         "suggestion": None
     }
-
-